@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from time import perf_counter_ns
+from typing import Any
+
+from .stage import Stage
+from .worker import Worker
+from .worker_exception import WorkerException
+from mpipeline.thread_safe_dict import ThreadSafeDict
+
+
+class FusedWorker(Worker[Any, Any]):
+    """Runs the workers of several adjacent thread stages back to back in one thread."""
+
+    def __init__(self, stages: tuple[Stage, ...]):
+        self.workers: list[Worker] = [stage.worker_class(*stage.worker_args, **stage.worker_kwargs) for stage in stages]
+        # per sub-stage processing time of the last item in ns, so progress bars stay per stage
+        self.stage_times: list[int] = []
+
+    def _init(self):
+        super()._init()
+        for worker in self.workers:
+            worker._init()
+
+    def doTask(self, inp: Any, *, thread_mode_shared_data: ThreadSafeDict | None = None, **kwargs) -> Any:
+        """Pass the input through each sub-worker in turn."""
+        stage_times = []
+        for worker in self.workers:
+            start_time = perf_counter_ns()
+            try:
+                inp = worker._process(inp, thread_mode_shared_data, **kwargs)
+            except BaseException as e:
+                raise WorkerException(e, worker.__class__.__name__, inp, thread_mode_shared_data)
+            stage_times.append(perf_counter_ns() - start_time)
+        self.stage_times = stage_times
+        return inp
+
+    def _dispose(self):
+        for worker in self.workers:
+            worker._dispose()
+        super()._dispose()
+
+    def __str__(self) -> str:
+        return '+'.join(str(worker) for worker in self.workers)
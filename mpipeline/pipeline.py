@@ -1,13 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import atexit
+import ctypes
+import dataclasses
+import heapq
+import itertools
 import multiprocessing as mp
 import threading
 import warnings
+import weakref
+from collections import deque
 from collections.abc import Iterable
 from collections.abc import Iterator
-from multiprocessing.pool import ThreadPool
-from time import perf_counter
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from queue import SimpleQueue
+from time import perf_counter_ns
 from typing import Any
 from typing import Generic
 from typing import Literal
@@ -15,23 +26,51 @@ from typing import TypeVar
 
 import setproctitle
 
+from .fused_worker import FusedWorker
 from .pipeline_tqdm import PipelineTQDM
+from .shared_array import discard_shared
+from .shared_array import load_shared
+from .shared_array import SharedArray
+from .shared_array import start_tracker
+from .spsc_channel import SpscChannel
 from .stage import Stage
 from .worker_exception import WorkerException
 from mpipeline.thread_safe_dict import ThreadSafeDict
 from mpipeline.worker import Worker
 # Thread-local storage for worker instances
 _local = threading.local()
+_exit_cleanup_registered = False
 T = TypeVar('T')
 Q = TypeVar('Q')
 Z = TypeVar('Z')
 
 ProgressType = Literal['total', 'stage', None]
 
+# how long a stage blocked on its in-flight window waits before re-checking for a stop
+_POLL_INTERVAL = 0.1
 
-class ForceExitException(BaseException):
-    def __init__(self, *args, **kwargs):
-        super().__init__("Force exit signal received")
+
+class _Skipped:
+    """Result of an item dropped because the run is stopping after a failure.
+
+    There is one instance, _SKIPPED, which stays the same object when pickled
+    back from a worker process.
+    """
+    __slots__ = ()
+
+    def __reduce__(self) -> str:
+        return '_SKIPPED'
+
+
+_SKIPPED = _Skipped()
+
+
+class _EndOfStage:
+    """Closes a stage's channel, carrying the error that ended the stage early, if any."""
+    __slots__ = ('error',)
+
+    def __init__(self, error: BaseException | None = None):
+        self.error = error
 
 
 def _cleanup_worker(_: Any = None, worker: Worker | None = None) -> None:
@@ -45,50 +84,464 @@ def _cleanup_worker(_: Any = None, worker: Worker | None = None) -> None:
         worker._dispose()
 
 
-def _init_worker(stage: Stage[T, Q], stage_idx: int, shared_data: ThreadSafeDict | None, internal_data: dict) -> Worker:
+class _SharedDataRef:
+    """The shared data of the current run, read by workers that outlive a single run."""
+    __slots__ = ('value',)
+
+    def __init__(self, value: ThreadSafeDict | None = None):
+        self.value = value
+
+
+def _bind_worker(worker: Worker, shared_data: _SharedDataRef, force_exit: ctypes.c_bool,
+                 export_arrays: bool = False, load_arrays: bool = False) -> None:
+    """Make worker the one the current thread runs items through."""
+    _local.worker = worker
+    _local.fused = isinstance(worker, FusedWorker)
+    _local.shared_data = shared_data
+    # shared memory flag, raised by whichever worker fails first
+    _local.force_exit = force_exit
+    _local.export_arrays = export_arrays
+    _local.load_arrays = load_arrays
+
+
+def _init_worker(stage: Stage[T, Q], stage_idx: int, shared_data: _SharedDataRef, force_exit: ctypes.c_bool,
+                 export_arrays: bool = False, load_arrays: bool = False) -> Worker:
     """Initialize worker in the pool process/thread."""
     try:
         setproctitle.setthreadtitle(str(stage.worker_class.__name__))
         setproctitle.setproctitle(str(stage.worker_class.__name__))
 
-        _local.worker = stage.worker_class(*stage.worker_args, **stage.worker_kwargs)
-        _local.worker._init()
-        _local.shared_data = shared_data
-        _local.internal_data = internal_data
+        worker = stage.worker_class(*stage.worker_args, **stage.worker_kwargs)
+        worker._init()
+        _bind_worker(worker, shared_data, force_exit, export_arrays, load_arrays)
         setproctitle.setthreadtitle(str(_local.worker))
         setproctitle.setproctitle(str(_local.worker))
-        atexit.register(_local.worker._dispose)
+        global _exit_cleanup_registered
+        if not _exit_cleanup_registered:
+            # One hook per process, disposing the worker of the thread that runs it: in a
+            # process pool worker that is its worker. Thread pools dispose theirs on shutdown.
+            atexit.register(_cleanup_worker)
+            _exit_cleanup_registered = True
         return _local.worker
     except BaseException as e:
-        raise WorkerException(e, stage.worker_class.__name__, None, shared_data)
+        raise WorkerException(e, stage.worker_class.__name__, None, shared_data.value)
 
 
-def _process_item(args: tuple[int, T | Exception], use_worker=None) -> tuple[int, Any | BaseException, float]:
-    """Process a single item using the thread-local worker."""
-    shared_data: ThreadSafeDict | None = _local.shared_data
-    internal_data = _local.internal_data
-    seq_num, inp = args
-    start_time = perf_counter()
+def _call_worker(inp: T, use_worker: Worker | None = None) -> Any:
+    """Run the thread-local worker on one input, raising its failure as a WorkerException."""
+    if inp is _SKIPPED or _local.force_exit.value:
+        if _local.load_arrays:
+            discard_shared(inp)
+        return _SKIPPED
     worker: Worker = use_worker or _local.worker
     try:
-        if isinstance(inp, BaseException):
-            raise inp
-        if internal_data['_force_exit']:
-            raise ForceExitException()
-        result = worker._process(inp, shared_data)
-        process_time = perf_counter() - start_time
-        return seq_num, result, process_time
+        if _local.load_arrays:
+            inp = load_shared(inp)
+        result = worker._process(inp, _local.shared_data.value)
+        return SharedArray.export(result) if _local.export_arrays else result
     except BaseException as e:
-        internal_data['_force_exit'] = True
-        _cleanup_worker()
-        # if isinstance(e, KeyboardInterrupt):
-        #     raise FORCE_EXIT_EXCEPTION
-        process_time = perf_counter() - start_time
-        if isinstance(e, WorkerException) or isinstance(e, ForceExitException):
-            return seq_num, e, process_time
-            # raise e
-        # raise WorkerException(e, worker.__class__.__name__, inp, shared_data)
-        return seq_num, WorkerException(e, worker.__class__.__name__, inp, shared_data), process_time
+        raise _worker_failure(e, worker, inp)
+
+
+async def _call_worker_async(inp: T, worker: Worker) -> Any:
+    """Coroutine counterpart of _call_worker, for stages running on an event loop."""
+    if inp is _SKIPPED or _local.force_exit.value:
+        if _local.load_arrays:
+            discard_shared(inp)
+        return _SKIPPED
+    try:
+        if _local.load_arrays:
+            inp = load_shared(inp)
+        shared_data = _local.shared_data.value
+        if asyncio.iscoroutinefunction(worker.doTask):
+            return await worker._process(inp, shared_data)
+        return await asyncio.to_thread(worker._process, inp, shared_data)
+    except BaseException as e:
+        raise _worker_failure(e, worker, inp)
+
+
+def _worker_failure(e: BaseException, worker: Worker, inp: Any) -> WorkerException:
+    """Raise the force-exit flag and wrap the error to be raised to the pipeline."""
+    _local.force_exit.value = True
+    _cleanup_worker(worker=worker)
+    if isinstance(e, WorkerException):
+        return e
+    return WorkerException(e, worker.__class__.__name__, inp, _local.shared_data.value)
+
+
+def _process_item(args: tuple[int, T]) -> tuple[int, Any]:
+    """Process a sequence-numbered item, for ordered runs."""
+    seq_num, inp = args
+    return seq_num, _call_worker(inp)
+
+
+def _elapsed(start_time: int, result: Any) -> int | list[int]:
+    """Processing time in ns of the item that produced result, one per sub-stage for a fused worker."""
+    if not _local.fused:
+        return perf_counter_ns() - start_time
+    if result is _SKIPPED:
+        # the sub-workers never ran, their times are still those of the previous item
+        return [0] * len(_local.worker.workers)
+    return _local.worker.stage_times
+
+
+def _process_item_timed(args: tuple[int, T]) -> tuple[tuple[int, Any], int]:
+    """Process a sequence-numbered item, timing it in ns for the progress bars."""
+    start_time = perf_counter_ns()
+    result = _process_item(args)
+    return result, _elapsed(start_time, result[1])
+
+
+def _process_unordered_item_timed(inp: T) -> tuple[Any, int]:
+    """Process a bare item, timing it in ns for the progress bars."""
+    start_time = perf_counter_ns()
+    result = _call_worker(inp)
+    return result, _elapsed(start_time, result)
+
+
+def _discard(item: Any) -> None:
+    """Free the shared memory behind a stage result that will never be loaded.
+
+    item is in any shape a stage passes on: bare, (seq_num, data), or either with its time.
+    """
+    if isinstance(item, SharedArray):
+        item.discard()
+    elif type(item) is tuple:
+        for part in item:
+            _discard(part)
+
+
+def _process_batch(task: tuple[Any, tuple]) -> list[Any]:
+    """Run one of the _ITEM_PROCESSORS entry points over a batch of items, as a single pool task."""
+    process_item, items = task
+    return [process_item(item) for item in items]
+
+
+def _batches(process_item, iterable: Iterable, size: int) -> Iterator[tuple[Any, tuple]]:
+    iterator = iter(iterable)
+    while batch := tuple(itertools.islice(iterator, size)):
+        yield process_item, batch
+
+
+class _ArrayResults:
+    """Results of a process stage handing arrays on through shared memory.
+
+    The items are batched here rather than by the pool, which would hide its own
+    result iterator, so that the arrays left in it or in the batch being read can
+    be freed when the run ends early: they are only freed by whoever loads them.
+    """
+
+    def __init__(self, pool, process_item, stage_input: Iterable, chunksize: int, ordered: bool):
+        imap = pool.imap if ordered else pool.imap_unordered
+        self._batches = imap(_process_batch, _batches(process_item, stage_input, chunksize))
+        self._pending: deque = deque()
+
+    def __iter__(self) -> Iterator[Any]:
+        pending = self._pending
+        for batch in self._batches:
+            pending.extend(batch)
+            while pending:
+                try:
+                    item = pending.popleft()
+                except IndexError:
+                    # taken by discard_rest()
+                    break
+                yield item
+
+    def discard_rest(self) -> None:
+        """Free the results not handed on yet, once the pool has stopped."""
+        while True:
+            try:
+                self._pending.extend(self._batches.next(timeout=0))
+            except (StopIteration, mp.TimeoutError):
+                break
+            except Exception:
+                # the failure of another batch
+                continue
+        while self._pending:
+            try:
+                _discard(self._pending.popleft())
+            except IndexError:
+                break
+
+
+# Worker entry points by (ordered_result, timed). Unordered runs never look at
+# sequence numbers, so their items cross the process boundary untagged.
+_ITEM_PROCESSORS = {
+    (True, False): _process_item,
+    (True, True): _process_item_timed,
+    (False, False): _call_worker,
+    (False, True): _process_unordered_item_timed,
+}
+_ITEM_PROCESSOR_MODES = {func: modes for modes, func in _ITEM_PROCESSORS.items()}
+
+
+class _WorkerThreadPool(ThreadPoolExecutor):
+    """Thread pool whose threads each build a worker on their first item, kept so shutdown can dispose them.
+
+    The worker is built inside that item's task rather than by a pool initializer, so a
+    failing worker init reaches the consumer as the item's WorkerException, as in the other
+    stage types, instead of breaking the pool with a BrokenThreadPool.
+    """
+
+    def __init__(self, stage: Stage, stage_idx: int, shared_data: _SharedDataRef, force_exit: ctypes.c_bool, load_arrays: bool = False):
+        self.workers: list[Worker] = []
+        self._worker_initargs = (stage, stage_idx, shared_data, force_exit, False, load_arrays)
+        super().__init__(max_workers=stage.worker_count, thread_name_prefix=stage.worker_class.__name__)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return super().submit(self._run, fn, *args, **kwargs)
+
+    def _run(self, fn, *args, **kwargs) -> Any:
+        if not hasattr(_local, 'worker'):
+            self.workers.append(_init_worker(*self._worker_initargs))
+        return fn(*args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+        for worker in self.workers:
+            _cleanup_worker(worker=worker)
+
+
+class _InlineStage:
+    """Single-thread stage run by the thread that collects its results, with no pool in between.
+
+    The worker is built on first use in that thread, which is the stage's own
+    feeder thread. Each run has new feeder threads, so later runs rebind it to theirs.
+    """
+
+    def __init__(self, stage: Stage, stage_idx: int, shared_data: _SharedDataRef, force_exit: ctypes.c_bool, load_arrays: bool = False):
+        self.initargs = (stage, stage_idx, shared_data, force_exit, False, load_arrays)
+        self.worker: Worker | None = None
+
+    def imap(self, func, iterable: Iterable) -> Iterator[Any]:
+        if self.worker is None:
+            self.worker = _init_worker(*self.initargs)
+        else:
+            _bind_worker(self.worker, *self.initargs[2:])
+        for item in iterable:
+            yield func(item)
+
+    def shutdown(self) -> None:
+        if self.worker:
+            _cleanup_worker(worker=self.worker)
+
+
+class _AsyncWorkerPool(Executor):
+    """Runs an async stage as coroutines on one event loop thread.
+
+    worker_count workers are created and lent out to one coroutine at a time, so
+    up to worker_count items are in progress without an OS thread each. Workers
+    with a synchronous doTask are run through asyncio.to_thread.
+    """
+
+    def __init__(self, stage: Stage, stage_idx: int, shared_data: _SharedDataRef, force_exit: ctypes.c_bool, load_arrays: bool = False):
+        self.workers: list[Worker] = []
+        self._futures: set[Future] = set()
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(max_workers=stage.worker_count))
+        self._idle: asyncio.Queue[Worker] = asyncio.Queue()
+        self._init_error: BaseException | None = None
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name=stage.worker_class.__name__, daemon=True,
+                                        args=(ready, stage, stage_idx, shared_data, force_exit, False, load_arrays))
+        self._thread.start()
+        ready.wait()
+        if self._init_error is not None:
+            self.shutdown()
+            raise self._init_error
+
+    def _serve(self, ready: threading.Event, stage: Stage, *args) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            for _ in range(stage.worker_count):
+                worker = _init_worker(stage, *args)
+                self.workers.append(worker)
+                self._idle.put_nowait(worker)
+        except BaseException as e:
+            self._init_error = e
+        ready.set()
+        if self._init_error is None:
+            self._loop.run_forever()
+
+    async def _run(self, func, item: Any) -> Any:
+        ordered, timed = _ITEM_PROCESSOR_MODES[func]
+        worker = await self._idle.get()
+        try:
+            start_time = perf_counter_ns()
+            if ordered:
+                seq_num, inp = item
+                result = seq_num, await _call_worker_async(inp, worker)
+            else:
+                result = await _call_worker_async(item, worker)
+            return (result, perf_counter_ns() - start_time) if timed else result
+        finally:
+            self._idle.put_nowait(worker)
+
+    def submit(self, func, /, *args, **kwargs) -> Future:
+        """Schedule func, one of the _ITEM_PROCESSORS entry points, as a coroutine with the same result shape."""
+        future = asyncio.run_coroutine_threadsafe(self._run(func, *args), self._loop)
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if cancel_futures:
+            for future in list(self._futures):
+                future.cancel()
+        if wait:
+            wait_futures(list(self._futures))
+        if self._init_error is None:
+            # let synchronous workers still inside asyncio.to_thread finish before disposing them
+            asyncio.run_coroutine_threadsafe(self._loop.shutdown_default_executor(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        for worker in self.workers:
+            _cleanup_worker(worker=worker)
+
+
+class _Same:
+    """Equal only to a _Same holding the very same object, whatever that object's == does."""
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Same) and other.value is self.value
+
+    def __hash__(self) -> int:
+        return id(self.value)
+
+
+def _snapshot(value: Any) -> Any:
+    """Copy the plain containers in value, with everything else compared by identity.
+
+    Enough to notice in-place edits of a stage's worker arguments, without
+    copying whatever objects they hold, or comparing them with an == that may
+    not return a bool, as for numpy arrays.
+    """
+    if type(value) is dict:
+        return {key: _snapshot(item) for key, item in value.items()}
+    if type(value) in (list, tuple, set):
+        return type(value)(_snapshot(item) for item in value)
+    return _Same(value)
+
+
+def _stop_pools(pools: list) -> None:
+    """Stop the worker pools of a pipeline, disposing their workers, and forget them."""
+    for pool in pools:
+        if isinstance(pool, Executor):
+            # not cancelled: after a failure the pending items are skipped right away,
+            # which frees the shared memory of their inputs
+            pool.shutdown()
+        elif isinstance(pool, _InlineStage):
+            pool.shutdown()
+        elif pool:
+            try:
+                pool.map(_cleanup_worker, range(pool._processes),)
+                pool.close()
+                pool.join()
+            except BaseException as e:
+                warnings.warn(f"Error during pool stop: {e}")
+    pools.clear()
+
+
+def _executor_imap(executor: Executor, func, iterable: Iterable, ordered: bool = True) -> Iterator[Any]:
+    """Executor counterpart of Pool.imap / Pool.imap_unordered.
+
+    Inputs are submitted from a feeder thread, so results can be consumed while
+    the upstream stage is still producing.
+    """
+    done: SimpleQueue = SimpleQueue()
+
+    def feed() -> None:
+        count = 0
+        try:
+            for item in iterable:
+                try:
+                    future = executor.submit(func, item)
+                except RuntimeError:
+                    # shut down by a run that ended early
+                    _discard(item)
+                    raise
+                if ordered:
+                    done.put(future)
+                else:
+                    future.add_done_callback(done.put)
+                count += 1
+        except BaseException as e:
+            done.put((count, e))
+        else:
+            done.put((count, None))
+
+    threading.Thread(target=feed, daemon=True).start()
+    received = 0
+    expected = None
+    while expected is None or received < expected:
+        item = done.get()
+        if isinstance(item, Future):
+            received += 1
+            yield item.result()
+        else:
+            expected, error = item
+            if error is not None:
+                raise error
+
+
+def _throttle(iterable: Iterable, window: threading.Semaphore, stop: threading.Event) -> Iterator[Any]:
+    """Yield items only while the stage has a free slot, so a slow consumer stalls its producers."""
+    for item in iterable:
+        while not window.acquire(timeout=_POLL_INTERVAL):
+            if stop.is_set():
+                _discard(item)
+                return
+        yield item
+
+
+def _reorder(items: Iterable[tuple[int, Any]], window: threading.Semaphore) -> Iterator[tuple[int, Any]]:
+    """Put (seq_num, data) pairs arriving in completion order back in sequence.
+
+    Each pair yielded frees a slot of window, which gates the run's input, so
+    the heap never holds more items than its size. A failure raised by items
+    ends the run right away, without waiting for the items before it.
+    """
+    heap: list[tuple[int, Any]] = []
+    next_seq = 0
+    try:
+        for item in items:
+            heapq.heappush(heap, item)
+            while heap and heap[0][0] == next_seq:
+                yield heapq.heappop(heap)
+                next_seq += 1
+                window.release()
+    finally:
+        # what is still held when the run ends early
+        for item in heap:
+            _discard(item)
+
+
+def _feed(items: Iterator[Any], channel: SpscChannel) -> None:
+    """Move one stage's results into the bounded channel read by the next stage."""
+    try:
+        for item in items:
+            if not channel.put(item):
+                _discard(item)
+                return
+    except BaseException as e:
+        channel.put(_EndOfStage(e))
+    else:
+        channel.put(_EndOfStage())
+
+
+def _drain(channel: SpscChannel) -> Iterator[Any]:
+    for item in channel:
+        if isinstance(item, _EndOfStage):
+            if item.error is not None:
+                raise item.error
+            return
+        yield item
 
 
 class Pipeline(Generic[T, Q]):
@@ -98,27 +551,38 @@ class Pipeline(Generic[T, Q]):
         """Initialize pipeline with first worker."""
         self.stages: list[Stage[Any, Any]] = [stage]
         self._contexts = {}
+        # kept between runs, and only ever cleared in place, so the finalizer below sees the current pools
         self._pools = []
         self._progress = None
-
-    def _terminate_pools(self):
-        for pool in self._pools:
-            if pool and hasattr(pool, '_pool'):
-                pool.close()
-                pool.terminate()
-                pool.join()
-        self._pools = []
+        self._force_exit: ctypes.c_bool | None = None
+        self._shared_data = _SharedDataRef()
+        # stages that get a pool, with the indices of the pipeline stages each one runs
+        self._compiled: list[tuple[list[int], Stage]] = []
+        # copy of the stages the pools were built for, None while there are none
+        self._stage_fingerprint: list[Stage] | None = None
+        self._running = False
+        weakref.finalize(self, _stop_pools, self._pools)
 
     def _stop_pools(self) -> None:
         """Stop all worker pools."""
-        for pool in self._pools:
-            if pool:
-                try:
-                    pool.map(_cleanup_worker, range(pool._processes),)
-                    pool.close()
-                    pool.join()
-                except BaseException as e:
-                    warnings.warn(f"Error during pool stop: {e}")
+        _stop_pools(self._pools)
+        self._stage_fingerprint = None
+
+    def close(self) -> None:
+        """Stop the worker pools kept alive between runs, disposing their workers."""
+        if self._running:
+            raise RuntimeError("Cannot close a pipeline while it is running")
+        self._stop_pools()
+
+    def __enter__(self) -> Pipeline[T, Q]:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None and self._running:
+            # leave the pools to the interrupted run, which stops them once its generator is closed,
+            # rather than hide the error with close()'s RuntimeError
+            return
+        self.close()
 
     def then(self, stage: Stage[Q, Z]) -> Pipeline[T, Z]:
         """Add a stage to the pipeline."""
@@ -133,71 +597,141 @@ class Pipeline(Generic[T, Q]):
         """
         return self.then(stage)
 
-    def _get_context(self, stage_idx: int, stage: Stage) -> mp.context.BaseContext:
-        if stage_idx not in self._contexts:
-            self._contexts[stage_idx] = mp.get_context(stage.multiprocess_mode)
-        return self._contexts[stage_idx]
-
-    def _init_pools(self, shared_data: ThreadSafeDict, internal_data: dict) -> None:
-        self._pools = []
+    def _get_context(self, stage: Stage) -> mp.context.BaseContext:
+        """Return the context for the stage's start method, shared by all stages using it."""
+        mode = stage.multiprocess_mode
+        if mode not in self._contexts:
+            if mode != 'fork':
+                # spawned workers use the parent's resource tracker if it runs before they
+                # start, instead of each starting their own process
+                start_tracker()
+            self._contexts[mode] = mp.get_context(mode)
+        return self._contexts[mode]
+
+    def _get_force_exit(self) -> ctypes.c_bool:
+        """Return the pipeline's shared force-exit flag, cleared for a new run.
+
+        It is only allocated on the first run, and reaches worker processes through
+        the pool initargs, so spawned workers inherit the same shared memory.
+        """
+        if self._force_exit is None:
+            self._force_exit = mp.Value(ctypes.c_bool, False, lock=False)
+        self._force_exit.value = False
+        return self._force_exit
+
+    def _compile(self) -> list[tuple[list[int], Stage]]:
+        """Group the pipeline stages into the stages that actually get a pool.
+
+        A thread stage with fuse set joins the previous stage when that is a thread stage
+        with the same worker_count, and each run of them becomes one FusedWorker stage,
+        saving a thread hop and a queue hand-off per item. It is opt-in because the fused
+        stages share worker_count threads, which halves the concurrency of I/O-bound ones.
+        cpu_bound process stages moved onto threads keep a pool of their own, as they are
+        called without shared data.
+        """
+        groups: list[list[int]] = []
+        for idx, stage in enumerate(self.stages):
+            if groups:
+                prev = self.stages[groups[-1][-1]]
+                if stage.fuse and stage.mode == 'thread' and prev.mode == 'thread' and stage.worker_count == prev.worker_count:
+                    groups[-1].append(idx)
+                    continue
+            groups.append([idx])
+
+        compiled = []
+        for group in groups:
+            stages = [self.stages[idx] for idx in group]
+            if len(stages) == 1:
+                compiled.append((group, stages[0]))
+            else:
+                fused = Stage(FusedWorker, worker_count=stages[0].worker_count, mode='thread',
+                              worker_args=(tuple(stages),), buffer_size=stages[0].buffer_size)
+                compiled.append((group, fused))
+        return compiled
+
+    def _ensure_pools(self, force_exit: ctypes.c_bool) -> None:
+        """Reuse the pools of the previous run, unless the stages changed since they were built."""
+        fingerprint = [dataclasses.replace(stage, worker_args=_snapshot(stage.worker_args), worker_kwargs=_snapshot(stage.worker_kwargs))
+                       for stage in self.stages]
+        if self._stage_fingerprint == fingerprint:
+            return
+        self._stop_pools()
+        self._init_pools(self._shared_data, force_exit)
+        self._stage_fingerprint = fingerprint
+
+    def _init_pools(self, shared_data: _SharedDataRef, force_exit: ctypes.c_bool) -> None:
+        self._pools.clear()
+        self._compiled = self._compile()
+        stages = [stage for _, stage in self._compiled]
+        if any(stage.exports_arrays() for stage in stages):
+            start_tracker()
         try:
-            for idx, stage in enumerate(self.stages):
-                if stage.mode == 'thread':
-                    pool = ThreadPool(
-                        processes=stage.worker_count,
-                        initializer=_init_worker,
-                        initargs=(stage, idx, shared_data, internal_data)
-                    )
+            for idx, stage in enumerate(stages):
+                load_arrays = idx > 0 and stages[idx - 1].exports_arrays()
+                mode = stage.get_mode()
+                # a cpu_bound process stage running on threads is still called like a process worker, without shared data
+                stage_shared_data = shared_data if stage.mode == mode else _SharedDataRef()
+                if mode == 'thread' and stage.worker_count == 1 and idx < len(stages) - 1:
+                    # a single thread gains nothing from a pool; the feeder thread collecting
+                    # this stage's results runs the worker itself. The last stage has no
+                    # feeder, and is never run on the caller's thread.
+                    pool = _InlineStage(stage, idx, stage_shared_data, force_exit, load_arrays)
+                elif mode == 'thread':
+                    pool = _WorkerThreadPool(stage, idx, stage_shared_data, force_exit, load_arrays)
+                elif mode == 'async':
+                    pool = _AsyncWorkerPool(stage, idx, shared_data, force_exit, load_arrays)
                 else:
-                    ctx = self._get_context(idx, stage)
+                    ctx = self._get_context(stage)
                     pool = ctx.Pool(
                         processes=stage.worker_count,
                         initializer=_init_worker,
-                        initargs=(stage, idx, None, internal_data)
+                        initargs=(stage, idx, _SharedDataRef(), force_exit, stage.exports_arrays(), load_arrays)
                     )
                 self._pools.append(pool)
         except BaseException as e:
             raise e
 
-    def _process_stage(self, internal_data: dict, stage_idx: int, iterator) -> Iterator[Any]:
+    def _process_stage(self, force_exit: ctypes.c_bool, stage_indices: list[int], iterator, window: threading.Semaphore,
+                       timed: bool) -> Iterator[Any]:
+        """Yield a stage's results, as (seq_num, data) pairs for ordered runs and bare data otherwise.
+
+        A worker failure is raised out of iterator as a WorkerException and passes straight through.
+        """
+        # a fused stage reports one processing time per pipeline stage it runs
+        fused = len(stage_indices) > 1
         for item in iterator:
-            try:
-                # if shared_data['_force_exit']:
-                #     continue
-                seq_num, data, proc_time = item
+            window.release()
+            if timed:
+                item, proc_time = item
                 if self._progress:
-                    self._progress.update_stage_progress(stage_idx, proc_time)
-                    if internal_data['_force_exit']:
+                    if fused:
+                        for stage_idx, stage_time in zip(stage_indices, proc_time):
+                            self._progress.update_stage_progress(stage_idx, stage_time)
+                    else:
+                        self._progress.update_stage_progress(stage_indices[0], proc_time)
+                    if force_exit.value:
                         self._progress.set_error()
+            yield item
 
-                yield seq_num, data
-                # if isinstance(data, BaseException):
-                #     raise data
-            except BaseException as e:
-                yield -1, e
-
-    def no_thread_run(self, inputs: Iterable[T], shared_data: ThreadSafeDict | None = None, ordered_result: bool = True, progress: ProgressType = None) -> Iterator[Q]:
+    def no_thread_run(self, inputs: Iterable[T], shared_data: ThreadSafeDict | None = None, ordered_result: bool = True, progress: ProgressType = None,
+                      total: int | None = None) -> Iterator[Q]:
 
         shared_data_dict = shared_data or ThreadSafeDict()
-        internal_data = {}
-        internal_data['_force_exit'] = False
+        force_exit = ctypes.c_bool(False)
 
-        total = len(inputs) if hasattr(inputs, '__len__') else None
+        if total is None:
+            total = len(inputs) if hasattr(inputs, '__len__') else None
         workers = [
-            _init_worker(stage, stage_idx, shared_data_dict, internal_data)
+            _init_worker(stage, stage_idx, _SharedDataRef(shared_data_dict), force_exit)
             for stage_idx, stage in enumerate(self.stages)
         ]
         self._progress = PipelineTQDM(self.stages, progress, total=total, no_thread=True)
         try:
-            for inp in enumerate(inputs):
-                data = None
+            for data in inputs:
                 for stage_idx, worker in enumerate(workers):
-                    seq_num, data, proc_time = _process_item(inp, worker)
-                    self._progress.update_stage_progress(stage_idx, proc_time)
-
-                    inp = seq_num, data
-                    if isinstance(data, BaseException):
-                        raise data
+                    start_time = perf_counter_ns()
+                    data = _call_worker(data, worker)
+                    self._progress.update_stage_progress(stage_idx, perf_counter_ns() - start_time)
                 yield data  # type: ignore
             # if exception is not None:
             #     raise exception
@@ -212,9 +746,13 @@ class Pipeline(Generic[T, Q]):
                 _cleanup_worker(worker=worker)
 
     def run(self, inputs: Iterable[T], shared_data: ThreadSafeDict | None = None,
-            ordered_result: bool = True, progress: ProgressType = None, no_thread: bool = False) -> Iterator[Q]:
+            ordered_result: bool = True, progress: ProgressType = None, no_thread: bool = False,
+            total: int | None = None) -> Iterator[Q]:
         """Run the pipeline on the inputs.
 
+        Worker pools are started by the first run and kept for the next one, as long as
+        it completes and the stages stay the same; call close() to stop them.
+
         Args:
             inputs: Input data to process
             ordered_result: If True, maintain input order in output
@@ -222,50 +760,115 @@ class Pipeline(Generic[T, Q]):
                      - 'total': Show overall progress
                      - 'stage': Show per-stage progress
                      - None: No progress tracking
+            total: Number of inputs, for the progress bar and the first stage's chunksize.
+                   Taken from len(inputs) if not given, so a generator can be passed
+                   instead of a list without losing either.
         """
         if not self.stages:
             raise ValueError("Pipeline has no stages")
         if no_thread:
-            yield from self.no_thread_run(inputs, shared_data, ordered_result, progress)
+            yield from self.no_thread_run(inputs, shared_data, ordered_result, progress, total)
             return
+        if self._running:
+            raise RuntimeError("Pipeline is already running; finish the previous run() first")
+        self._running = True
 
-        shared_data_dict = shared_data if shared_data is not None else ThreadSafeDict()
-        with mp.Manager() as manager:
-            internal_data: dict = manager.dict()  # type: ignore
-            internal_data['_force_exit'] = False
+        self._shared_data.value = shared_data if shared_data is not None else ThreadSafeDict()
+        force_exit = self._get_force_exit()
+        if total is None:
             total = len(inputs) if hasattr(inputs, '__len__') else None
 
-            self._progress = PipelineTQDM(self.stages, progress, total=total)
+        self._progress = PipelineTQDM(self.stages, progress, total=total)
+        stop = threading.Event()
+        channels: list[SpscChannel] = []
+        array_results: list[_ArrayResults] = []
+        # timing every item is only worth it when there is a progress bar to feed
+        timed = progress is not None
+        process_item = _ITEM_PROCESSORS[ordered_result, timed]
+        completed = False
 
-            try:
-                self._init_pools(shared_data_dict, internal_data)
-                current_data = enumerate(inputs)
-                for stage_idx, (stage, pool) in enumerate(zip(self.stages, self._pools)):
-
-                    results_iter = pool.imap(_process_item, current_data) if ordered_result else \
-                        pool.imap_unordered(_process_item, current_data)
-
-                    if stage_idx == len(self.stages) - 1:
-                        for seg_idx, res in self._process_stage(internal_data, stage_idx, results_iter):
-                            # if exception is not None:
-                            #     continue
-                            if isinstance(res, ForceExitException):
+        try:
+            self._ensure_pools(force_exit)
+            # only the first stage knows its input length, later stages are fed item by item
+            chunksizes = [stage.get_chunksize(total if idx == 0 else None) for idx, (_, stage) in enumerate(self._compiled)]
+            buffer_sizes = [stage.get_buffer_size(chunksize) for (_, stage), chunksize in zip(self._compiled, chunksizes)]
+            # Ordered runs let every stage pass items on as they complete, and put them back
+            # in sequence at the end, so one slow item does not hold up the ones behind it.
+            # A later stage that batches its input waits for a full batch, which the reorder
+            # window could hold back, so with one of those every stage keeps input order.
+            reorder = ordered_result and all(chunksize == 1 for chunksize in chunksizes[1:])
+            current_data = enumerate(inputs) if ordered_result else inputs
+            if reorder:
+                # room for every stage's window and the channel behind it
+                reorder_window = threading.Semaphore(2 * sum(buffer_sizes))
+                current_data = _throttle(current_data, reorder_window, stop)
+            in_order = ordered_result and not reorder
+            for stage_idx, ((stage_indices, stage), pool) in enumerate(zip(self._compiled, self._pools)):
+                chunksize = chunksizes[stage_idx]
+                buffer_size = buffer_sizes[stage_idx]
+                # items handed to the pool but not yet taken back out of it
+                window = threading.Semaphore(buffer_size)
+                stage_input = _throttle(current_data, window, stop)
+                if isinstance(pool, _InlineStage):
+                    results_iter = pool.imap(process_item, stage_input)
+                elif isinstance(pool, Executor):
+                    results_iter = _executor_imap(pool, process_item, stage_input, in_order)
+                elif stage.exports_arrays():
+                    results_iter = _ArrayResults(pool, process_item, stage_input, chunksize, in_order)
+                    array_results.append(results_iter)
+                else:
+                    results_iter = pool.imap(process_item, stage_input, chunksize=chunksize) if in_order else \
+                        pool.imap_unordered(process_item, stage_input, chunksize=chunksize)
+                stage_output = self._process_stage(force_exit, stage_indices, results_iter, window, timed)
+
+                if stage_idx == len(self._compiled) - 1:
+                    if reorder:
+                        stage_output = _reorder(stage_output, reorder_window)
+                    load_results = stage.exports_arrays()
+                    try:
+                        for item in stage_output:
+                            res = item[1] if ordered_result else item
+                            if res is _SKIPPED:
                                 continue
-                            if isinstance(res, BaseException):
-                                # exception = res
-                                raise res
-                            else:
-                                yield res
-                    else:
-                        current_data = self._process_stage(internal_data, stage_idx, results_iter)
-                # if exception is not None:
-                #     raise exception
-            except BaseException as e:
-                internal_data['_force_exit'] = True
-                if isinstance(e, WorkerException):
-                    e.re_raise()
-                raise
-            finally:
+                            yield load_shared(res) if load_results else res
+                    finally:
+                        # if the run ends early, frees what the reorder heap still holds
+                        stage_output.close()
+                else:
+                    # the feeder thread is this channel's only producer, the next stage's input its only consumer
+                    channel = SpscChannel(buffer_size)
+                    channels.append(channel)
+                    threading.Thread(target=_feed, args=(stage_output, channel), daemon=True).start()
+                    current_data = _drain(channel)
+            # if exception is not None:
+            #     raise exception
+            completed = True
+        except BaseException as e:
+            force_exit.value = True
+            if isinstance(e, WorkerException):
+                e.re_raise()
+            raise
+        finally:
+            try:
+                stop.set()
+                for channel in channels:
+                    channel.close()
                 if self._progress:
                     self._progress.cleanup()
-                self._stop_pools()
+            finally:
+                # even if cleaning up failed, so the pipeline can be closed and run again
+                try:
+                    if not completed:
+                        # a failed worker has been disposed, and an abandoned run may leave items behind in the pools
+                        self._stop_pools()
+                        # blocks in shared memory are only freed by whoever loads them,
+                        # which nobody will now do for the arrays still in flight
+                        for results in array_results:
+                            results.discard_rest()
+                        if array_results:
+                            for channel in channels:
+                                for item in channel.take_all():
+                                    _discard(item)
+                finally:
+                    self._shared_data.value = None
+                    self._running = False
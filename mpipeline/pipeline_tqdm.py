@@ -1,33 +1,49 @@
 from __future__ import annotations
 
 from collections import deque
-
-from tqdm.auto import tqdm
+from time import perf_counter
+from typing import TYPE_CHECKING
 
 from .stage import Stage
 
+if TYPE_CHECKING:
+    from tqdm.auto import tqdm
+
 
 class PipelineTQDM:
     """Handles progress bar functionality for the pipeline."""
 
+    # minimum seconds between two redraws of the same bar
+    refresh_interval = 0.1
+
     def __init__(self, stages: list[Stage], progress, total: int | None = None, no_thread: bool = False):
         self.stages = stages
         self.show_progress = progress is not None
         self.show_stage_progress = progress == 'stage'
         self.progress_bars: list[tqdm] = []
         self.stage_pbars: list[tqdm] = []
+        # processing times are integer ns, converted to seconds only for display
         self.stage_times: list[deque] = [deque(maxlen=100) for _ in stages]
+        self.stage_sum: list[int] = [0] * len(stages)  # running sum of stage_times
         self.stage_start_times: list[float | None] = [None] * len(stages)
         self.stage_processed: list[int] = [0] * len(stages)
-        self.stage_total_times: list[float] = [0.0] * len(stages)  # Track cumulative processing time
+        self.stage_total_times: list[int] = [0] * len(stages)  # Track cumulative processing time
         self.total = total
         self.no_thread = no_thread
+        # items counted but not yet drawn, and when each bar was last redrawn
+        self.stage_pending: list[int] = [0] * len(stages)
+        self.stage_last_refresh: list[float] = [0.0] * len(stages)
+        self.main_pending = 0
+        self.main_last_refresh = 0.0
         self.init_progress_bars()
 
     def init_progress_bars(self) -> None:
         """Initialize progress bars and related tracking variables."""
         if not self.show_progress:
             return
+        # imported here so runs without progress bars, and importing the package, skip loading tqdm
+        from tqdm.auto import tqdm
+
         desc = "Total Progress"
         if self.no_thread:
             desc += " [NO THREAD]"
@@ -44,7 +60,7 @@ class PipelineTQDM:
                 if self.no_thread:
                     desc = f"{i + 1}: {stage.worker_class.__name__}"
                 else:
-                    desc = f"{i + 1}: {stage.worker_class.__name__} x {stage.mode[0].upper()}{stage.worker_count}"
+                    desc = f"{i + 1}: {stage.worker_class.__name__} x {stage.get_mode()[0].upper()}{stage.worker_count}"
                 bar_format = "{l_bar}{bar}| {n_fmt}/{total_fmt}{postfix}"  # Remove default elapsed/remaining
                 stage_pbar = tqdm(total=self.total,
                                   desc=desc,
@@ -58,17 +74,30 @@ class PipelineTQDM:
     def set_error(self):
         pass
 
-    def update_stage_progress(self, stage_idx: int, result_time: float) -> None:
-        """Update progress bar for a specific stage."""
+    def update_stage_progress(self, stage_idx: int, result_time: int) -> None:
+        """Update progress bar for a specific stage with an item's processing time in ns."""
         if stage_idx == len(self.stages) - 1:
             self.update_main_progress(1)
         if not (self.show_progress and self.show_stage_progress and self.stage_pbars):
             return
 
         self.stage_processed[stage_idx] += 1
-        self.stage_times[stage_idx].append(result_time)
+        times = self.stage_times[stage_idx]
+        if len(times) == times.maxlen:
+            self.stage_sum[stage_idx] -= times[0]
+        times.append(result_time)
+        self.stage_sum[stage_idx] += result_time
         self.stage_total_times[stage_idx] += result_time  # Add to cumulative time
-        avg_time = sum(self.stage_times[stage_idx]) / len(self.stage_times[stage_idx])
+        self.stage_pending[stage_idx] += 1
+
+        now = perf_counter()
+        if now - self.stage_last_refresh[stage_idx] >= self.refresh_interval:
+            self.stage_last_refresh[stage_idx] = now
+            self.refresh_stage(stage_idx)
+
+    def refresh_stage(self, stage_idx: int) -> None:
+        """Draw the items counted since the last redraw, with fresh stats."""
+        avg_time = self.stage_sum[stage_idx] / len(self.stage_times[stage_idx]) / 1e9
 
         # Calculate items waiting to be processed
         if stage_idx == 0:
@@ -83,8 +112,11 @@ class PipelineTQDM:
         rate = 1 / avg_time if avg_time > 0 else 0
         if rate >= 1:
             rate_str = f"{rate:.2f}it/s"
-        else:
+        elif rate > 0:
             rate_str = f"{1 / rate:.2f}s/it"
+        else:
+            # only zero times so far, e.g. fused stages reporting items skipped after a failure
+            rate_str = "?it/s"
 
         # Format elapsed and remaining times in MM:SS format
         def format_time(seconds):
@@ -92,25 +124,46 @@ class PipelineTQDM:
             seconds = int(seconds) % 60
             return f"{minutes:02d}:{seconds:02d}"
 
-        elapsed_str = format_time(self.stage_total_times[stage_idx])
+        elapsed_str = format_time(self.stage_total_times[stage_idx] / 1e9)
         remaining_str = format_time(remaining)
 
         # Update stage progress bar
-        self.stage_pbars[stage_idx].update(1)  # Update progress first
+        self.stage_pbars[stage_idx].update(self.stage_pending[stage_idx])  # Update progress first
+        self.stage_pending[stage_idx] = 0
         self.stage_pbars[stage_idx].set_postfix_str(
             f"{elapsed_str}<{remaining_str} {rate_str} waiting:{waiting}",
-            refresh=True
+            refresh=False
         )
+        self.stage_pbars[stage_idx].refresh()
 
     def update_main_progress(self, num: int) -> None:
         """Update the main progress bar."""
         if self.show_progress and self.progress_bars:
-            self.progress_bars[0].update(num)
+            self.main_pending += num
+            now = perf_counter()
+            if now - self.main_last_refresh >= self.refresh_interval:
+                self.main_last_refresh = now
+                self.progress_bars[0].update(self.main_pending)
+                self.main_pending = 0
+
+    def flush(self) -> None:
+        """Draw everything still pending, so the bars end on the real counts."""
+        if self.main_pending and self.progress_bars:
+            self.progress_bars[0].update(self.main_pending)
+            self.main_pending = 0
+        for stage_idx, pending in enumerate(self.stage_pending):
+            if pending and stage_idx < len(self.stage_pbars):
+                self.refresh_stage(stage_idx)
 
     def cleanup(self) -> None:
         """Clean up all progress bars."""
+        try:
+            self.flush()
+        except BaseException:
+            pass
         for pbar in self.progress_bars:
-            if pbar:
+            # not truthiness: a tqdm without a total has no bool()
+            if pbar is not None:
                 try:
                     pbar.close()
                 except BaseException:
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from typing import Any
+from typing import NamedTuple
+
+
+class SharedArray(NamedTuple):
+    """Handle to a numpy array parked in shared memory by a process stage.
+
+    Only the handle is pickled between processes; whoever loads it copies the
+    array out and frees the block.
+    """
+    name: str
+    shape: tuple
+    # the numpy dtype itself: its str form drops the fields of structured dtypes
+    dtype: Any
+
+    @classmethod
+    def export(cls, value: Any) -> Any:
+        """Move an array into a new shared memory block, passing anything else through."""
+        import numpy as np
+        # object arrays hold pointers into this process, only pickling carries what they point to
+        if not isinstance(value, np.ndarray) or value.dtype.hasobject:
+            return value
+        shm = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+        try:
+            np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        return cls(shm.name, value.shape, value.dtype)
+
+    def load(self) -> Any:
+        """Copy the array out of shared memory and release the block."""
+        import numpy as np
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            return np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def discard(self) -> None:
+        """Release the block of an array that will never be loaded."""
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def load_shared(value: Any) -> Any:
+    return value.load() if isinstance(value, SharedArray) else value
+
+
+def discard_shared(value: Any) -> None:
+    if isinstance(value, SharedArray):
+        value.discard()
+
+
+def start_tracker() -> None:
+    """Start the resource tracker before any pool does, so every worker shares it.
+
+    Blocks are created in one process and unlinked in another; with a tracker
+    per forked worker each of them would report the others' blocks as leaked.
+    There is no tracker process on Windows.
+    """
+    if os.name == 'posix':
+        resource_tracker.ensure_running()
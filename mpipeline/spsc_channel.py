@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from collections.abc import Iterator
+from typing import Any
+
+
+class SpscChannel:
+    """Bounded channel between exactly one producer thread and one consumer thread.
+
+    deque.append and deque.popleft are atomic, so handing an item over takes no
+    lock. The events are only used when one side has to wait for the other: the
+    consumer on an empty channel, the producer on a full one.
+    """
+
+    def __init__(self, maxsize: int):
+        self._items: deque = deque()
+        self._maxsize = max(1, maxsize)
+        self._not_empty = threading.Event()
+        self._not_full = threading.Event()
+        self._closed = False
+
+    def put(self, item: Any) -> bool:
+        """Append an item, waiting while the channel is full. Returns False once the channel is closed."""
+        while len(self._items) >= self._maxsize:
+            # clear before re-checking, so a get() in between is seen either here or by the wait
+            self._not_full.clear()
+            if self._closed:
+                return False
+            if len(self._items) >= self._maxsize:
+                self._not_full.wait()
+        if self._closed:
+            return False
+        self._items.append(item)
+        if not self._not_empty.is_set():
+            self._not_empty.set()
+        return True
+
+    def __iter__(self) -> Iterator[Any]:
+        """Yield items as they arrive until the channel is closed."""
+        items = self._items
+        while not self._closed:
+            try:
+                item = items.popleft()
+            except IndexError:
+                self._not_empty.clear()
+                if not items and not self._closed:
+                    self._not_empty.wait()
+                continue
+            if not self._not_full.is_set():
+                self._not_full.set()
+            yield item
+
+    def close(self) -> None:
+        """Stop handing out items and wake both sides. Whatever is queued stays for take_all()."""
+        self._closed = True
+        self._not_empty.set()
+        self._not_full.set()
+
+    def take_all(self) -> list[Any]:
+        """Remove and return the queued items, once the consumer is gone."""
+        items = []
+        while self._items:
+            try:
+                items.append(self._items.popleft())
+            except IndexError:
+                break
+        return items
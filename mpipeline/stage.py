@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass
 from dataclasses import field
 from typing import Generic
@@ -12,13 +13,49 @@ from .worker import Worker
 T = TypeVar('T')
 Q = TypeVar('Q')
 
+# largest chunksize picked from the input length; the stage window scales with it,
+# so an uncapped one would let a stage pull in a large part of the input at once
+_MAX_AUTO_CHUNKSIZE = 32
+
 
 @dataclass
 class Stage(Generic[T, Q]):
     worker_class: type[Worker[T, Q]]
     worker_count: int = 1
-    # queue_size: int = 100
-    mode: Literal['thread', 'process'] = 'thread'
+    mode: Literal['thread', 'process', 'async'] = 'thread'
     multiprocess_mode: Literal['spawn', 'fork'] = 'spawn'
     worker_args: tuple = field(default_factory=tuple)
     worker_kwargs: dict = field(default_factory=dict)
+    # items sent to a process worker per task; None picks one from the input length for the first stage
+    chunksize: int | None = None
+    # items in flight in this stage and queued for the next one; None means 2 * worker_count chunks
+    buffer_size: int | None = None
+    # 'ndarray': array results of a process stage reach the next stage through shared memory, not pickling
+    payload: Literal['ndarray'] | None = None
+    # a process stage that only needs processes to get around the GIL; runs on threads when there is none
+    cpu_bound: bool = False
+    # run in the same thread as the previous stage, when both are thread stages with the same worker_count
+    fuse: bool = False
+
+    def get_chunksize(self, total: int | None) -> int:
+        # only process pools take items in chunks; the other modes are fed one at a time
+        if self.get_mode() != 'process':
+            return 1
+        if self.chunksize is not None:
+            return max(1, self.chunksize)
+        if total is None:
+            return 1
+        return max(1, min(total // (4 * self.worker_count), _MAX_AUTO_CHUNKSIZE))
+
+    def get_mode(self) -> Literal['thread', 'process', 'async']:
+        # checked when pools are built: importing an extension that is not free-threading safe re-enables the GIL
+        if self.cpu_bound and self.mode == 'process' and not getattr(sys, '_is_gil_enabled', lambda: True)():
+            return 'thread'
+        return self.mode
+
+    def exports_arrays(self) -> bool:
+        return self.payload == 'ndarray' and self.get_mode() == 'process'
+
+    def get_buffer_size(self, chunksize: int = 1) -> int:
+        # a chunk is only dispatched once it is full, so the window must fit at least one
+        return max(self.buffer_size or 2 * self.worker_count * chunksize, chunksize)
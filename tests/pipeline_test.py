@@ -1,11 +1,24 @@
 import unittest
+import unittest.mock
+import os
+import sys
 import time
 import asyncio
+import ctypes
 from typing import List, Any
+from mpipeline.fused_worker import FusedWorker
 from mpipeline.pipeline import Pipeline, Stage
+from mpipeline.pipeline_tqdm import PipelineTQDM
+from mpipeline.pipeline import _SKIPPED, _InlineStage, _SharedDataRef, _init_worker, _process_unordered_item_timed
+from mpipeline.thread_safe_dict import ThreadSafeDict
 from mpipeline.worker import Worker
 from mpipeline.worker_exception import WorkerException
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class SimpleWorker(Worker[int, int]):
     def doTask(self, inp: int) -> int:
@@ -53,6 +66,121 @@ class InitWorker(Worker[int, int]):
         self.multiplier = 0
 
 
+class KwargsWorker(Worker[int, int]):
+    def doTask(self, inp: int, **kwargs) -> int:
+        return inp + 1
+
+
+class FailOnceWorker(Worker[int, int]):
+    failed = False
+
+    def doTask(self, inp: int, **kwargs) -> int:
+        if inp == 3 and not FailOnceWorker.failed:
+            FailOnceWorker.failed = True
+            raise ValueError("first run fails")
+        return inp
+
+
+class ArrayWorker(Worker[int, Any]):
+    def doTask(self, inp: int, **kwargs) -> Any:
+        return np.full((64, 64), inp)
+
+
+class ArraySumWorker(Worker[Any, int]):
+    def doTask(self, inp: Any, **kwargs) -> int:
+        return int(inp.sum())
+
+
+class ArraySumErrorWorker(Worker[Any, int]):
+    def doTask(self, inp: Any, **kwargs) -> int:
+        if not inp.any():
+            raise ValueError("Empty array")
+        return int(inp.sum())
+
+
+class DtypeArrayWorker(Worker[int, Any]):
+    def __init__(self, dtype: str):
+        self.dtype = dtype
+
+    def doTask(self, inp: int, **kwargs) -> Any:
+        if self.dtype == 'object':
+            return np.array([{'x': inp}, 'text', None], dtype=object)
+        return np.array([(inp, inp / 2)], dtype=[('x', '<i4'), ('y', '<f8')])
+
+
+class ArrayListWorker(Worker[Any, Any]):
+    def doTask(self, inp: Any, **kwargs) -> Any:
+        return inp.dtype.names, inp.tolist()
+
+
+class AsyncKwargsWorker(Worker[int, int]):
+    async def doTask(self, inp: int, **kwargs) -> int:
+        await asyncio.sleep(0.1)
+        return inp * 2
+
+
+class CountingWorker(Worker[int, int]):
+    instances = 0
+
+    def __init__(self):
+        CountingWorker.instances += 1
+
+    def doTask(self, inp: int, **kwargs) -> int:
+        kwargs['thread_mode_shared_data']['seen'] = inp
+        return inp + 1
+
+
+class UnevenWorker(Worker[int, int]):
+    def doTask(self, inp: int, **kwargs) -> int:
+        time.sleep(0.05 if inp % 5 == 0 else 0.001)
+        return inp
+
+
+class PidWorker(Worker[int, int]):
+    def doTask(self, inp: int) -> int:
+        return os.getpid()
+
+
+class KwargsErrorWorker(Worker[int, int]):
+    def doTask(self, inp: int, **kwargs) -> int:
+        if inp > 5:
+            raise ValueError(f"Input {inp} is too large")
+        return inp
+
+
+class AddWorker(Worker[int, int]):
+    def __init__(self, add: int):
+        self.add = add
+
+    def doTask(self, inp: int, **kwargs) -> int:
+        return inp + self.add
+
+
+class BrokenInitWorker(Worker[int, int]):
+    def __init__(self):
+        raise RuntimeError("cannot start")
+
+    def doTask(self, inp: int, **kwargs) -> int:
+        return inp
+
+
+class InlineWorker(Worker[int, int]):
+    instances = 0
+    disposed = 0
+
+    def __init__(self):
+        InlineWorker.instances += 1
+
+    def doTask(self, inp: int, **kwargs) -> int:
+        if inp < 0:
+            raise ValueError("negative input")
+        kwargs['thread_mode_shared_data']['inline'] = inp
+        return inp * 2
+
+    def doDispose(self):
+        InlineWorker.disposed += 1
+
+
 class PipelineTest(unittest.TestCase):
     def setUp(self):
         self.inputs = list(range(10))
@@ -121,6 +249,230 @@ class PipelineTest(unittest.TestCase):
         results = list(pipeline.run(self.inputs))
         self.assertEqual(results, [x * 2 for x in self.inputs])
 
+    def test_chunksize(self):
+        """Test that chunked dispatch keeps every item and its order."""
+        pipeline = Pipeline(Stage(KwargsWorker, worker_count=2, chunksize=3)).then(Stage(KwargsWorker, mode='process', chunksize=4))
+        results = list(pipeline.run(self.inputs))
+        self.assertEqual(results, [x + 2 for x in self.inputs])
+        self.assertEqual(Stage(KwargsWorker, worker_count=2, mode='process').get_chunksize(100), 12)
+        self.assertEqual(Stage(KwargsWorker, worker_count=2, mode='process').get_chunksize(100000), 32)
+        self.assertEqual(Stage(KwargsWorker, worker_count=2, mode='process').get_chunksize(None), 1)
+        self.assertEqual(Stage(KwargsWorker, worker_count=2).get_chunksize(100), 1)
+
+    def test_backpressure_with_total(self):
+        """Test that a known total does not let the first stage pull far ahead of a slow stage."""
+        # the stage windows, the channel between them and the reorder window
+        limits = {'thread': 50, 'process': 2 * (2 * 2 * 32 + 2) + 32}
+        for mode, limit in limits.items():
+            with self.subTest(mode):
+                pulled = 0
+
+                def inputs():
+                    nonlocal pulled
+                    for x in range(100000):
+                        pulled += 1
+                        yield x
+
+                pipeline = Pipeline(Stage(KwargsWorker, worker_count=2, mode=mode)).then(Stage(SlowWorker, mode='process'))
+                results = pipeline.run(inputs(), total=100000)
+                next(results)
+                time.sleep(0.5)
+                results.close()
+                self.assertLess(pulled, limit)
+
+    def test_rerun_after_error(self):
+        """Test that a failed run does not leave the force-exit flag raised."""
+        pipeline = Pipeline(Stage(FailOnceWorker, worker_count=2))
+        with self.assertRaises(WorkerException):
+            list(pipeline.run(self.inputs))
+        self.assertEqual(list(pipeline.run(self.inputs)), self.inputs)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_shared_array_payload(self):
+        """Test handing arrays between process stages through shared memory."""
+        pipeline = Pipeline(Stage(ArrayWorker, worker_count=2, mode='process', payload='ndarray')) \
+            .then(Stage(ArraySumWorker, worker_count=2, mode='process'))
+        results = list(pipeline.run(self.inputs))
+        self.assertEqual(results, [x * 64 * 64 for x in self.inputs])
+
+    @unittest.skipIf(np is None or not os.path.isdir('/dev/shm'), "needs numpy and /dev/shm")
+    def test_shared_array_freed_when_run_ends_early(self):
+        """Test that no shared memory block outlives a run that failed or was not consumed to the end."""
+        def blocks():
+            return len([name for name in os.listdir('/dev/shm') if name.startswith('psm_')])
+
+        before = blocks()
+        for ordered in (True, False):
+            with self.subTest(ordered=ordered):
+                pipeline = Pipeline(Stage(ArrayWorker, worker_count=4, mode='process', multiprocess_mode='fork', payload='ndarray')) \
+                    .then(Stage(ArraySumErrorWorker, worker_count=2, mode='process', multiprocess_mode='fork'))
+                with self.assertRaises(WorkerException):
+                    list(pipeline.run(range(1000), ordered_result=ordered))
+                self.assertEqual(blocks(), before)
+                pipeline = Pipeline(Stage(ArrayWorker, worker_count=4, mode='process', multiprocess_mode='fork', payload='ndarray')) \
+                    .then(Stage(ArraySumWorker, worker_count=2, mode='process', multiprocess_mode='fork'))
+                results = pipeline.run(range(1000), ordered_result=ordered)
+                next(results)
+                results.close()
+                self.assertEqual(blocks(), before)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_shared_array_payload_dtypes(self):
+        """Test that structured arrays keep their fields and object arrays fall back to pickling."""
+        pipeline = Pipeline(Stage(DtypeArrayWorker, mode='process', payload='ndarray', worker_kwargs={'dtype': 'structured'})) \
+            .then(Stage(ArrayListWorker, mode='process'))
+        self.assertEqual(list(pipeline.run(range(3))), [(('x', 'y'), [(x, x / 2)]) for x in range(3)])
+        pipeline = Pipeline(Stage(DtypeArrayWorker, mode='process', payload='ndarray', worker_kwargs={'dtype': 'object'})) \
+            .then(Stage(ArrayListWorker, mode='process'))
+        self.assertEqual(list(pipeline.run(range(3))), [(None, [{'x': x}, 'text', None]) for x in range(3)])
+
+    def test_async_mode(self):
+        """Test running coroutine workers concurrently on an event loop."""
+        pipeline = Pipeline(Stage(AsyncKwargsWorker, worker_count=10, mode='async'))
+
+        start_time = time.time()
+        results = list(pipeline.run(self.inputs))
+        end_time = time.time()
+
+        self.assertLess(end_time - start_time, 0.1 * len(self.inputs))
+        self.assertEqual(results, [x * 2 for x in self.inputs])
+
+    def test_pools_reused_between_runs(self):
+        """Test that workers outlive a run, and see the shared data of the current one."""
+        CountingWorker.instances = 0
+        with Pipeline(Stage(CountingWorker, worker_count=2)) as pipeline:
+            for last in (5, 7):
+                shared_data = ThreadSafeDict()
+                self.assertEqual(list(pipeline.run(range(last + 1), shared_data=shared_data)), list(range(1, last + 2)))
+                self.assertIn('seen', shared_data)
+            # threads build their worker on their first item, so at most one per thread over both runs
+            self.assertLessEqual(CountingWorker.instances, 2)
+            instances = CountingWorker.instances
+            pipeline.stages[0].worker_count = 3
+            list(pipeline.run(self.inputs))
+            self.assertGreater(CountingWorker.instances, instances)
+        self.assertEqual(pipeline._pools, [])
+
+    def test_pools_rebuilt_after_stage_edit(self):
+        """Test that editing a stage's worker_kwargs in place rebuilds its workers."""
+        stage = Stage(AddWorker, worker_kwargs={'add': 1})
+        with Pipeline(stage) as pipeline:
+            self.assertEqual(list(pipeline.run([0, 1, 2])), [1, 2, 3])
+            stage.worker_kwargs['add'] = 100
+            self.assertEqual(list(pipeline.run([0, 1, 2])), [100, 101, 102])
+
+    def test_failed_cleanup_ends_run(self):
+        """Test that a failing progress cleanup still leaves the pipeline usable."""
+        pipeline = Pipeline(Stage(KwargsWorker, worker_count=2))
+        with unittest.mock.patch.object(PipelineTQDM, 'cleanup', side_effect=RuntimeError("cleanup failed")):
+            with self.assertRaises(RuntimeError):
+                list(pipeline.run(self.inputs, progress='total'))
+        self.assertEqual(list(pipeline.run(self.inputs)), [x + 1 for x in self.inputs])
+        pipeline.close()
+        self.assertEqual(pipeline._pools, [])
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_pools_rebuilt_after_array_argument_change(self):
+        """Test that replacing an array worker argument rebuilds the workers."""
+        stage = Stage(AddWorker, worker_args=(np.arange(3),))
+        with Pipeline(stage) as pipeline:
+            self.assertEqual([list(x) for x in pipeline.run([0])], [[0, 1, 2]])
+            self.assertEqual([list(x) for x in pipeline.run([1])], [[1, 2, 3]])
+            stage.worker_args = (np.arange(3) * 2,)
+            self.assertEqual([list(x) for x in pipeline.run([0])], [[0, 2, 4]])
+
+    def test_context_manager_keeps_error(self):
+        """Test that leaving the with block on an error mid-run raises that error."""
+        with self.assertRaises(ValueError):
+            with Pipeline(Stage(KwargsWorker, worker_count=2)) as pipeline:
+                results = pipeline.run(self.inputs)
+                next(results)
+                raise ValueError("consumer failed")
+        results.close()
+        self.assertEqual(pipeline._pools, [])
+
+    def test_ordered_results_uneven_latency(self):
+        """Test that items overtaking a slow one are put back in order."""
+        pipeline = Pipeline(Stage(KwargsWorker, worker_count=2)) | Stage(UnevenWorker, worker_count=4) | Stage(KwargsWorker, worker_count=2)
+        results = list(pipeline.run(range(50)))
+        self.assertEqual(results, [x + 2 for x in range(50)])
+
+    def test_generator_with_total(self):
+        """Test streaming inputs from a generator with an explicit total."""
+        pipeline = Pipeline(Stage(KwargsWorker, worker_count=2))
+        results = list(pipeline.run((x for x in self.inputs), total=len(self.inputs), progress='total'))
+        self.assertEqual(pipeline._progress.total, len(self.inputs))
+        self.assertEqual(results, [x + 1 for x in self.inputs])
+
+    def test_generator_progress_without_total(self):
+        """Test a progress bar of unknown length over a generator."""
+        with Pipeline(Stage(KwargsWorker, worker_count=2)) as pipeline:
+            for _ in range(2):
+                results = list(pipeline.run((x for x in self.inputs), progress='total'))
+                self.assertEqual(results, [x + 1 for x in self.inputs])
+
+    def test_cpu_bound_without_gil(self):
+        """Test that cpu_bound process stages run on threads when the GIL is disabled."""
+        stage = Stage(PidWorker, worker_count=2, mode='process', cpu_bound=True)
+        with unittest.mock.patch.object(sys, '_is_gil_enabled', lambda: True, create=True):
+            self.assertEqual(stage.get_mode(), 'process')
+        with unittest.mock.patch.object(sys, '_is_gil_enabled', lambda: False, create=True):
+            self.assertEqual(stage.get_mode(), 'thread')
+            self.assertEqual(set(Pipeline(stage).run(self.inputs)), {os.getpid()})
+
+    def test_fused_stages(self):
+        """Test that fuse=True runs adjacent thread stages in one pool, keeping per-stage results and progress."""
+        pipeline = Pipeline(Stage(KwargsWorker, worker_count=2)) | Stage(KwargsWorker, worker_count=2, fuse=True) | Stage(KwargsWorker, worker_count=2)
+        results = list(pipeline.run(self.inputs, progress='stage'))
+        self.assertEqual(results, [x + 3 for x in self.inputs])
+        self.assertEqual([indices for indices, _ in pipeline._compiled], [[0, 1], [2]])
+        self.assertEqual(pipeline._progress.stage_processed, [len(self.inputs)] * 3)
+
+        pipeline = Pipeline(Stage(KwargsWorker, worker_count=2)) | Stage(KwargsErrorWorker, worker_count=2, fuse=True)
+        with self.assertRaises(WorkerException) as ctx:
+            list(pipeline.run(self.inputs))
+        self.assertEqual(ctx.exception.stage, 'KwargsErrorWorker')
+
+    def test_fused_skipped_item_timing(self):
+        """Test that a fused worker reports zero times for items skipped after a failure."""
+        stage = Stage(FusedWorker, worker_args=((Stage(KwargsWorker), Stage(KwargsWorker)),))
+        worker = _init_worker(stage, 0, _SharedDataRef(ThreadSafeDict()), ctypes.c_bool(False))
+        self.assertEqual(_process_unordered_item_timed(1)[0], 3)
+        self.assertEqual(_process_unordered_item_timed(_SKIPPED), (_SKIPPED, [0, 0]))
+        worker._dispose()
+
+    def test_worker_init_failure(self):
+        """Test that a worker failing to initialize raises its WorkerException whatever the stage type."""
+        stages = {
+            'thread': Stage(BrokenInitWorker, worker_count=2),
+            'inline': Stage(BrokenInitWorker),
+            'async': Stage(BrokenInitWorker, worker_count=2, mode='async'),
+        }
+        for name, stage in stages.items():
+            with self.subTest(name):
+                with self.assertRaises(WorkerException) as ctx:
+                    list((Pipeline(stage) | Stage(KwargsWorker, worker_count=2)).run(self.inputs))
+                self.assertIsInstance(ctx.exception.orig_exc, RuntimeError)
+
+    def test_inline_stage(self):
+        """Test a single-thread stage run by its feeder thread: reuse across runs, failure and disposal."""
+        InlineWorker.instances = InlineWorker.disposed = 0
+        pipeline = Pipeline(Stage(InlineWorker)) | Stage(KwargsWorker, worker_count=2)
+        for _ in range(2):
+            shared_data = ThreadSafeDict()
+            self.assertEqual(list(pipeline.run(self.inputs, shared_data=shared_data)), [x * 2 + 1 for x in self.inputs])
+            self.assertEqual(shared_data['inline'], self.inputs[-1])
+        self.assertIsInstance(pipeline._pools[0], _InlineStage)
+        self.assertEqual((InlineWorker.instances, InlineWorker.disposed), (1, 0))
+        pipeline.close()
+        self.assertEqual(InlineWorker.disposed, 1)
+
+        with self.assertRaises(WorkerException) as ctx:
+            list(pipeline.run([1, -1, 2]))
+        self.assertEqual(ctx.exception.stage, 'InlineWorker')
+        self.assertEqual((InlineWorker.instances, InlineWorker.disposed), (2, 2))
+        self.assertEqual(list(pipeline.run([3])), [7])
+
 
 if __name__ == '__main__':
     unittest.main()
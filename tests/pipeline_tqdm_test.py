@@ -0,0 +1,53 @@
+import io
+import unittest
+import unittest.mock
+
+from mpipeline.pipeline_tqdm import PipelineTQDM
+from mpipeline.stage import Stage
+from mpipeline.worker import Worker
+
+
+class NoopWorker(Worker[int, int]):
+    def doTask(self, inp: int, **kwargs) -> int:
+        return inp
+
+
+class PipelineTQDMTest(unittest.TestCase):
+    def setUp(self):
+        self.stages = [Stage(NoopWorker), Stage(NoopWorker, worker_count=2)]
+        # keep the bars out of the test output
+        patcher = unittest.mock.patch('sys.stderr', io.StringIO())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batched_redraw_and_flush(self):
+        """Test that redraws are batched and flush() brings every bar to its real count."""
+        progress = PipelineTQDM(self.stages, 'stage', total=250)
+        progress.refresh_interval = 60
+        for _ in range(250):
+            for stage_idx in range(len(self.stages)):
+                progress.update_stage_progress(stage_idx, 1000)
+        # only the first item of each bar was drawn right away
+        self.assertEqual([pbar.n for pbar in progress.progress_bars], [1, 1, 1])
+        self.assertEqual(progress.stage_pending, [249, 249])
+        progress.flush()
+        self.assertEqual([pbar.n for pbar in progress.progress_bars], [250, 250, 250])
+        self.assertEqual(progress.stage_pending, [0, 0])
+        self.assertEqual(progress.main_pending, 0)
+        progress.cleanup()
+        self.assertEqual(progress.progress_bars, [])
+
+    def test_running_sum_after_eviction(self):
+        """Test that the running sum tracks the last 100 times once older ones are evicted."""
+        progress = PipelineTQDM(self.stages, 'stage', total=250)
+        for item in range(250):
+            progress.update_stage_progress(0, item * 1000)
+        times = progress.stage_times[0]
+        self.assertEqual(len(times), times.maxlen)
+        self.assertEqual(progress.stage_sum[0], sum(times))
+        self.assertEqual(progress.stage_total_times[0], sum(item * 1000 for item in range(250)))
+        progress.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import random
+import threading
+import time
+import unittest
+
+from mpipeline.spsc_channel import SpscChannel
+
+
+class SpscChannelTest(unittest.TestCase):
+    def test_stress(self):
+        """Test that every item arrives once and in order through a tiny channel with random stalls."""
+        count = 20000
+        channel = SpscChannel(2)
+        received = []
+        rng = random.Random(0)
+        stalls = [rng.random() < 0.01 for _ in range(count)]
+
+        def produce():
+            for i in range(count):
+                if stalls[i]:
+                    time.sleep(0.0005)
+                channel.put(i)
+
+        def consume():
+            for item in channel:
+                received.append(item)
+                if stalls[-item - 1]:
+                    time.sleep(0.0005)
+                if len(received) == count:
+                    return
+
+        threads = [threading.Thread(target=produce, daemon=True), threading.Thread(target=consume, daemon=True)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+            self.assertFalse(thread.is_alive(), "producer or consumer stuck")
+        self.assertEqual(received, list(range(count)))
+
+    def test_close_wakes_blocked_put(self):
+        """Test that close() releases a producer waiting on a full channel."""
+        channel = SpscChannel(1)
+        self.assertTrue(channel.put(0))
+        result = []
+        thread = threading.Thread(target=lambda: result.append(channel.put(1)), daemon=True)
+        thread.start()
+        time.sleep(0.05)
+        self.assertTrue(thread.is_alive())
+        channel.close()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(result, [False])
+        self.assertFalse(channel.put(2))
+
+    def test_close_wakes_blocked_consumer(self):
+        """Test that close() ends iteration for a consumer waiting on an empty channel."""
+        channel = SpscChannel(4)
+        received = []
+        thread = threading.Thread(target=lambda: received.extend(channel), daemon=True)
+        thread.start()
+        time.sleep(0.05)
+        self.assertTrue(thread.is_alive())
+        channel.close()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(received, [])
+
+    def test_take_all_after_close(self):
+        """Test that items left in a closed channel are no longer handed out, but can be taken back."""
+        channel = SpscChannel(4)
+        for i in range(3):
+            channel.put(i)
+        channel.close()
+        self.assertEqual(list(channel), [])
+        self.assertEqual(channel.take_all(), [0, 1, 2])
+        self.assertEqual(channel.take_all(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()